@@ -0,0 +1,50 @@
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# each command is started, answers the first prompt with "quit" and exits
+COMMANDS = [
+    ("python main.py", [os.path.join(ROOT, "main.py")], "3\n"),
+    ("python manager.py menu", [os.path.join(ROOT, "manager.py"), "menu"], "4\n"),
+    ("import main (test collection)", ["-c", "import main"], ""),
+]
+
+
+def measure(args, stdin, cwd, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], input=stdin, text=True, cwd=cwd,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+                       env=dict(os.environ, PYTHONPATH=ROOT))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the CLI entry points.")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per command")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        # run against a copy of the sample data so the repository is left untouched
+        if os.path.exists(os.path.join(ROOT, "data.json")):
+            shutil.copy(os.path.join(ROOT, "data.json"), cwd)
+        baseline = measure(["-c", "pass"], "", cwd, args.runs)
+        print(f"{'command':<32}{'min ms':>10}{'median ms':>12}{'mean ms':>10}")
+        print(f"{'python -c pass (interpreter)':<32}{min(baseline):>10.1f}"
+              f"{statistics.median(baseline):>12.1f}{statistics.mean(baseline):>10.1f}")
+        for name, command, stdin in COMMANDS:
+            timings = measure(command, stdin, cwd, args.runs)
+            print(f"{name:<32}{min(timings):>10.1f}{statistics.median(timings):>12.1f}{statistics.mean(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
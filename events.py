@@ -0,0 +1,120 @@
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from storage import file_lock
+
+INBOX_SIZE = 100
+
+
+class EventBus:
+    def __init__(self):
+        self.handlers = {}
+        self.pending = []
+        self.last_seq = 0
+
+    def subscribe(self, name, handler):
+        # handlers are keyed so that a new UserManager replaces the previous inbox instead of stacking
+        self.handlers[name] = handler
+
+    def unsubscribe(self, name):
+        self.handlers.pop(name, None)
+
+    def publish(self, kind, recipients, message, actor=None, project=None, task=None):
+        recipients = [recipient for recipient in dict.fromkeys(recipients) if recipient != actor]
+        if not recipients or not self.handlers:
+            return None
+        self.last_seq = max(time.time_ns(), self.last_seq + 1)
+        event = {
+            "seq": self.last_seq,
+            "time": datetime.now().isoformat(),
+            "kind": kind,
+            "actor": actor,
+            "project": project,
+            "task": task,
+            "message": message,
+            "recipients": recipients,
+        }
+        # events wait until the change they describe has been saved, see flush()
+        self.pending.append(event)
+        return event
+
+    def flush(self, matches=None, deliver=True):
+        ready = [event for event in self.pending if matches is None or matches(event)]
+        self.pending = [event for event in self.pending if not (matches is None or matches(event))]
+        if deliver:
+            for event in ready:
+                for handler in list(self.handlers.values()):
+                    handler(event)
+        return ready
+
+
+bus = EventBus()
+
+
+class Inbox:
+    """
+    Bounded per-user notification inboxes.
+
+    Every delivery appends one JSON line to ``<directory>/<user>.jsonl``, so
+    fan-out costs O(recipients). A file is compacted to the newest ``size``
+    events once it holds twice that many, which keeps reads bounded too.
+    Appends and compaction hold ``<user>.lock``, so processes delivering to
+    the same inbox neither lose lines nor miscount them.
+    """
+
+    def __init__(self, directory, size=INBOX_SIZE):
+        self.directory = directory
+        self.size = size
+
+    def path(self, username, suffix=".jsonl"):
+        from urllib.parse import quote
+        return os.path.join(self.directory, quote(username, safe="") + suffix)
+
+    def deliver(self, event):
+        os.makedirs(self.directory, exist_ok=True)
+        line = json.dumps({key: value for key, value in event.items() if key != "recipients"}) + "\n"
+        for username in event["recipients"]:
+            with file_lock(self.path(username, ".lock")):
+                with open(self.path(username), "a") as file:
+                    file.write(line)
+                # counted from the file, other processes append to it too
+                if len(self.read_lines(username)) >= 2 * self.size:
+                    self.compact(username)
+
+    def read_lines(self, username, limit=None):
+        try:
+            with open(self.path(username), "r") as file:
+                return list(deque(file, maxlen=limit))
+        except FileNotFoundError:
+            return []
+
+    def compact(self, username):
+        # callers hold the inbox lock, an append between reading and replacing would be lost
+        lines = self.read_lines(username, self.size)
+        temp_path = self.path(username, ".tmp")
+        with open(temp_path, "w") as file:
+            file.writelines(lines)
+        os.replace(temp_path, self.path(username))
+
+    def events(self, username):
+        return [json.loads(line) for line in self.read_lines(username, self.size)]
+
+    def last_read(self, username):
+        try:
+            with open(self.path(username, ".seen"), "r") as file:
+                return int(file.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def unread(self, username):
+        last_read = self.last_read(username)
+        return [event for event in self.events(username) if event["seq"] > last_read]
+
+    def mark_read(self, username, events):
+        if not events:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.path(username, ".seen"), "w") as file:
+            file.write(str(max(event["seq"] for event in events)))
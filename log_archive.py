@@ -0,0 +1,141 @@
+import glob
+import gzip
+import json
+import os
+from datetime import datetime
+
+BLOCK_RECORDS = 1000
+ENTITY_KEYS = ("user", "project", "task")
+ENTITY_MARKER = " | entities="
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+LOG_FORMAT = "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line} - {message}{extra[entities]}"
+
+
+def add_entities(record):
+    # loguru patcher: renders bound user/project/task as a JSON suffix the archive index can read back
+    entities = {key: str(record["extra"][key]) for key in ENTITY_KEYS if key in record["extra"]}
+    record["extra"]["entities"] = f"{ENTITY_MARKER}{json.dumps(entities)}" if entities else ""
+
+
+def parse_record(record):
+    try:
+        timestamp = datetime.strptime(record[:23], TIME_FORMAT)
+    except ValueError:
+        timestamp = None
+    first_line = record.split("\n", 1)[0]
+    entities = {}
+    if ENTITY_MARKER in first_line:
+        try:
+            entities = json.loads(first_line.rsplit(ENTITY_MARKER, 1)[1])
+        except ValueError:
+            entities = {}
+    return timestamp, entities
+
+
+def iter_records(lines):
+    # continuation lines (tracebacks) belong to the record before them
+    record = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if record is not None and parse_record(line)[0] is None:
+            record += "\n" + line
+            continue
+        if record is not None:
+            yield record
+        record = line
+    if record is not None:
+        yield record
+
+
+def index_block(records):
+    timestamps = []
+    entities = {key: set() for key in ENTITY_KEYS}
+    for record in records:
+        timestamp, record_entities = parse_record(record)
+        if timestamp is not None:
+            timestamps.append(timestamp)
+        for key, value in record_entities.items():
+            if key in entities:
+                entities[key].add(value)
+    entry = {
+        "start": min(timestamps).isoformat() if timestamps else None,
+        "end": max(timestamps).isoformat() if timestamps else None,
+        "records": len(records),
+    }
+    entry.update({key: sorted(values) for key, values in entities.items()})
+    return entry
+
+
+def archive_log(path, block_records=BLOCK_RECORDS):
+    """
+    Compress a rotated log into ``<path>.gz`` plus a ``<path>.gz.idx`` sidecar.
+
+    Each block of records is its own gzip member, so the archive is still a
+    plain ``.gz`` file while any block can be decompressed on its own from
+    the offset stored in the index. Used as loguru's ``compression`` hook.
+    """
+    archive_path = f"{path}.gz"
+    blocks = []
+    with open(path, "r", encoding="utf-8", errors="replace") as source, open(archive_path, "wb") as archive:
+        records = []
+        for record in iter_records(source):
+            records.append(record)
+            if len(records) >= block_records:
+                blocks.append(write_block(archive, records))
+                records = []
+        if records:
+            blocks.append(write_block(archive, records))
+    with open(f"{archive_path}.idx", "w") as file:
+        json.dump({"archive": os.path.basename(archive_path), "blocks": blocks}, file)
+    os.remove(path)
+    return archive_path
+
+
+def write_block(archive, records):
+    entry = index_block(records)
+    data = gzip.compress(("\n".join(records) + "\n").encode("utf-8"))
+    entry["offset"] = archive.tell()
+    entry["length"] = len(data)
+    archive.write(data)
+    return entry
+
+
+def record_matches(timestamp, entities, filters, since, until):
+    if since is not None and (timestamp is None or timestamp < since):
+        return False
+    if until is not None and (timestamp is None or timestamp > until):
+        return False
+    return all(entities.get(key) == value for key, value in filters.items())
+
+
+def block_matches(block, filters, since, until):
+    if since is not None and (block["end"] is None or datetime.fromisoformat(block["end"]) < since):
+        return False
+    if until is not None and (block["start"] is None or datetime.fromisoformat(block["start"]) > until):
+        return False
+    return all(value in block.get(key, ()) for key, value in filters.items())
+
+
+def query_log(log_file="app.log", user=None, project=None, task=None, since=None, until=None):
+    """Yield log records matching every given filter, oldest archive first, then the live log."""
+    filters = {key: value for key, value in (("user", user), ("project", project), ("task", task)) if value is not None}
+    base, extension = os.path.splitext(log_file)
+    for index_path in sorted(glob.glob(f"{glob.escape(base)}.*{extension}.gz.idx")):
+        with open(index_path, "r") as file:
+            index = json.load(file)
+        archive_path = os.path.join(os.path.dirname(index_path), index["archive"])
+        with open(archive_path, "rb") as archive:
+            for block in index["blocks"]:
+                if not block_matches(block, filters, since, until):
+                    continue
+                archive.seek(block["offset"])
+                data = gzip.decompress(archive.read(block["length"])).decode("utf-8")
+                for record in iter_records(data.splitlines()):
+                    if record_matches(*parse_record(record), filters, since, until):
+                        yield record
+
+    if os.path.exists(log_file):
+        with open(log_file, "r", encoding="utf-8", errors="replace") as file:
+            for record in iter_records(file):
+                if record_matches(*parse_record(record), filters, since, until):
+                    yield record
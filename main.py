@@ -1,17 +1,42 @@
-from rich.console import Console
-from rich.prompt import Prompt
-from rich.table import Table
-import uuid
+import os
 from datetime import datetime, timedelta
 from enum import Enum
-import json
-from passlib.hash import sha256_crypt
-from prompt_toolkit import prompt
-from prompt_toolkit.shortcuts import radiolist_dialog
-from loguru import logger
+from types import MappingProxyType
+from events import Inbox, bus
+from storage import ShardedStorage
+from snapshot import SnapshotStore
 
-console = Console()
-logger.add("app.log", rotation="500 MB", level="INFO")
+
+class LazyObject:
+    # rich and loguru dominate startup time, so they are only imported on first use
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+
+    def __getattr__(self, name):
+        if self._target is None:
+            self._target = self._factory()
+        return getattr(self._target, name)
+
+
+def load_console():
+    from rich.console import Console
+    return Console()
+
+
+def load_logger():
+    from loguru import logger
+    return logger
+
+
+console = LazyObject(load_console)
+logger = LazyObject(load_logger)
+
+
+def configure_logging():
+    from log_archive import LOG_FORMAT, add_entities, archive_log
+    logger.configure(patcher=add_entities)
+    logger.add("app.log", rotation="500 MB", compression=archive_log, level="INFO", format=LOG_FORMAT)
 
 class TaskStatus(Enum):
     BACKLOG = "BACKLOG"
@@ -28,19 +53,41 @@ class TaskPriority(Enum):
     LOW = "LOW"
 
 
+def enum_value(value):
+    return value.value if isinstance(value, Enum) else value
+
+
 class Task:
 
+    def __setattr__(self, name, value):
+        # any change drops the frozen copy cached by snapshot.freeze_task. assignees and comments are
+        # tuples of read-only values, so they can only change by being reassigned here
+        object.__setattr__(self, name, value)
+        if name != "frozen":
+            object.__setattr__(self, "frozen", None)
+
     def __init__(self, title, assignees, priority=TaskPriority.LOW, status=TaskStatus.BACKLOG, description=""):
-        self.id = uuid.uuid4().hex
+        self.id = os.urandom(16).hex()
         self.title = title
-        self.assignees = assignees
+        self.assignees = tuple(assignees)
         self.priority = priority
         self.status = status
         self.start_time = datetime.now()
         self.end_date = datetime.now() + timedelta(days=1)
-        self.comments = []
+        self.comments = ()
         self.description = description
 
+    @classmethod
+    def from_dict(cls, data):
+        task = cls(data["title"], data["assignees"], data["priority"], data["status"], data["description"])
+        task.id = data["id"]
+        task.start_time = datetime.fromisoformat(data["start_time"])
+        task.end_date = datetime.fromisoformat(data["end_date"])
+        task.comments = tuple(
+            MappingProxyType(dict(comment, time=datetime.fromisoformat(comment["time"]))) for comment in data["comments"]
+        )
+        return task
+
     def add_comment(self, user, content):
         comment = {
             "index": len(self.comments) + 1,
@@ -48,21 +95,28 @@ class Task:
             "time": datetime.now(),
             "content": content
         }
-        self.comments.append(comment)
+        self.comments += (MappingProxyType(comment),)
+        bus.publish("task_comment", self.assignees, f"{user.username} commented on task '{self.title}': {content}",
+                    actor=user.username, task=self.id)
     def remove_comment(self,comment_id):
         
-        updated_comments = [comment for comment in self.comments if str(comment["index"]) != comment_id]
+        updated_comments = tuple(comment for comment in self.comments if str(comment["index"]) != comment_id)
         if len(updated_comments) < len(self.comments):
             self.comments = updated_comments
             return True
         return False
 
-    def add_member(self, username):
-        self.assignees.append(username)
+    def add_member(self, username, actor=None):
+        self.assignees += (username,)
+        bus.publish("task_assigned", [username], f"You were assigned to task '{self.title}'", actor=actor, task=self.id)
+
+    def change_status(self, status, actor=None):
+        self.status = status
+        bus.publish("task_status", self.assignees, f"Task '{self.title}' moved to {enum_value(status)}", actor=actor, task=self.id)
 
     def remove_assignee(self, username):
         if username in self.assignees:
-            self.assignees = [assignee for assignee in self.assignees if assignee != username]
+            self.assignees = tuple(assignee for assignee in self.assignees if assignee != username)
             console.print(f"[green]User {username} removed from the task![/green]")
             return
         console.print("[red]Error: User not found in the task.[/red]")
@@ -81,6 +135,7 @@ class Task:
         return False
 
     def generate_comments_table(self):
+        from rich.table import Table
         table = Table(title="Comments")
         table.add_column("Index")
         table.add_column("Author")
@@ -97,6 +152,7 @@ class Task:
         return table
 
     def generate_table(self):
+        from rich.table import Table
         table = Table(title="Task Details")
         table.add_column("Attribute")
         table.add_column("Value")
@@ -123,12 +179,33 @@ class User:
 
 
 class Project:
-    def __init__(self, project_id, title, creator, members=None, tasks=None):
+    def __init__(self, project_id, title, creator, members=None, tasks=None, key=None):
+        self.key = key if key is not None else os.urandom(16).hex()
         self.project_id = project_id
         self.title = title
         self.creator = creator
-        self.members = members if members is not None else [creator]
-        self.tasks = []
+        self.members = list(members) if members is not None else [creator]
+        self.tasks = [Task.from_dict(task) for task in tasks] if tasks is not None else []
+        self.task_index = {task.id: task for task in self.tasks}
+
+    def refresh(self, data):
+        # takes over a shard merged with other sessions' changes, keeping unchanged Task objects
+        self.project_id, self.title, self.creator = data["project_id"], data["title"], data["creator"]
+        self.members = list(data["members"])
+        current = {task.id: task for task in self.tasks}
+        tasks = []
+        for task_data in data["tasks"]:
+            fresh = Task.from_dict(task_data)
+            task = current.get(fresh.id)
+            if task is None:
+                task = fresh
+            else:
+                for name, value in fresh.__dict__.items():
+                    if name != "frozen" and getattr(task, name) != value:
+                        setattr(task, name, value)
+            tasks.append(task)
+        self.tasks = tasks
+        self.task_index = {task.id: task for task in tasks}
 
     def add_member(self, member):
         self.members.append(member)
@@ -138,10 +215,25 @@ class Project:
             self.members.remove(member)
 
     def get_task(self, task_id):
-        for task in self.tasks:
-            if task.id == task_id:
-                return task
-        return None
+        task = self.task_index.get(task_id)
+        if task is None and len(self.task_index) != len(self.tasks):
+            # tasks were appended to the list directly, rebuild the index once
+            self.task_index = {task.id: task for task in self.tasks}
+            task = self.task_index.get(task_id)
+        return task
+
+    def select_tasks(self, ids=None, status=None, priority=None, assignee=None, title=None):
+        if ids is not None:
+            candidates = [task for task in map(self.get_task, ids) if task is not None]
+        else:
+            candidates = self.tasks
+        return [
+            task for task in candidates
+            if (status is None or enum_value(task.status) == status)
+            and (priority is None or enum_value(task.priority) == priority)
+            and (assignee is None or assignee in task.assignees)
+            and (title is None or title.lower() in task.title.lower())
+        ]
     
     def is_member_exist(self,member):
         return member in self.members
@@ -150,28 +242,44 @@ class Project:
         task = Task(title, assignees, priority, status, description)
         print(task.get_assignee())
         self.tasks.append(task)
-        logger.info(f"Task created: {task.title} by {self.creator}")
+        self.task_index[task.id] = task
+        bus.publish("task_assigned", assignees, f"You were assigned to task '{task.title}' in project '{self.title}'",
+                    actor=self.creator, project=self.title, task=task.id)
+        logger.bind(user=self.creator, project=self.title, task=task.id).info(f"Task created: {task.title} by {self.creator}")
         console.print("[green]Task created successfully![/green]")
 
     def remove_task(self, task_id):
-        for task in self.tasks:
-            if task.id == task_id:
-                self.tasks.remove(task)
-                console.print("[green]Task deleted successfully![/green]")
-                return
+        if self.remove_tasks([task_id]):
+            console.print("[green]Task deleted successfully![/green]")
+            return
         console.print("[red]Error: Task not found.[/red]")
 
-    def get_task(self, task_id):
-        for task in self.tasks:
-            if task.id == task_id:
-                return task
-        return None
+    def remove_tasks(self, task_ids):
+        task_ids = set(task_ids)
+        updated_tasks = [task for task in self.tasks if task.id not in task_ids]
+        removed = len(self.tasks) - len(updated_tasks)
+        self.tasks = updated_tasks
+        for task_id in task_ids:
+            self.task_index.pop(task_id, None)
+        # unsaved events about deleted tasks would otherwise never match a save
+        bus.flush(lambda event: event["task"] in task_ids, deliver=False)
+        return removed
+
+
+
+BULK_ACTIONS = ("status", "priority", "add_assignee", "remove_assignee", "archive", "delete")
 
 
 class UserManager:
-    def __init__(self):
+    def __init__(self, storage=None):
         self.users = []
         self.projects = []
+        self.storage = storage if storage is not None else ShardedStorage()
+        self.snapshots = SnapshotStore()
+        self.inbox = Inbox(os.path.join(self.storage.data_dir, "inbox"))
+        # events left unsaved by a previous session are dropped
+        bus.flush(deliver=False)
+        bus.subscribe("inbox", self.inbox.deliver)
         self.load_data()
         self.project_id_counter = 1
 
@@ -179,12 +287,14 @@ class UserManager:
         if self.is_email_duplicate(email) or self.is_username_duplicate(username):
             console.print("[red]Error: Duplicate email or username. Please choose another one.[/red]")
             return
+        from passlib.hash import sha256_crypt
         hashed_password = sha256_crypt.hash(password)
         user = User(email, username, hashed_password)
         self.users.append(user)
-        self.save_data()
+        self.save_user(user)
+        self.snapshots.commit_user(user)
         console.print("[green]User registered successfully![/green]")
-        logger.info(f"User registered: {username}")
+        logger.bind(user=username).info(f"User registered: {username}")
 
     def is_email_duplicate(self, email):
         return any(user.email == email for user in self.users)
@@ -193,28 +303,32 @@ class UserManager:
         return any(user.username == username for user in self.users)
 
     def login(self, username, password):
+        from passlib.hash import sha256_crypt
         for user in self.users:
             if user.username == username:
                 if user.activated:
                     if sha256_crypt.verify(password, user.password):
-                        logger.info(f"User logged in: {username}")
+                        logger.bind(user=username).info(f"User logged in: {username}")
                         return user
                     else:
-                        logger.warning(f"Failed login attempt for user: {username}")
+                        logger.bind(user=username).warning(f"Failed login attempt for user: {username}")
                         return None
                 else:
-                    logger.warning(f"Attempted login for disabled user: {username}")
+                    logger.bind(user=username).warning(f"Attempted login for disabled user: {username}")
                     console.print("[red]Error: user was disabled![/red]")
                     return -1
-        logger.warning(f"Invalid username: {username}")
+        logger.bind(user=username).warning(f"Invalid username: {username}")
         return None
 
     def create_project(self, id, user, title):
+        if self.is_project_exist(title):
+            console.print("[red]Error: Project with this name already exists[/red]")
+            return None
         project = Project(id, title, user.username)
         self.projects.append(project)
-        self.save_data()
+        self.save_project(project)
         console.print("[green]Project created successfully![/green]")
-        logger.info(f"Project created: {title} by {user.username}")
+        logger.bind(user=user.username, project=title).info(f"Project created: {title} by {user.username}")
         return project
     
     def is_project_exist(self,title):
@@ -225,51 +339,103 @@ class UserManager:
 
     def add_member_to_project(self, project, username):
         project.add_member(username)
-        logger.info(f"User {username} added to project: {project.title}")
+        bus.publish("project_member_added", [username], f"You were added to project '{project.title}'",
+                    actor=project.creator, project=project.title)
+        logger.bind(user=username, project=project.title).info(f"User {username} added to project: {project.title}")
         console.print(f"[green]User {username} added to the project![/green]")
-        self.save_data()
+        self.save_project(project)
         return
 
     def remove_project(self, project):
         self.projects.remove(project)
-        logger.info(f"Project deleted: {project.title}")
+        self.storage.remove_project(project.key)
+        self.snapshots.drop_project(project.key)
+        logger.bind(user=project.creator, project=project.title).info(f"Project deleted: {project.title}")
         console.print("[green]Project deleted successfully![/green]")
 
     def remove_member_from_project(self, project, username):
         if username in project.members:
             project.remove_member(username)
-            logger.info(f"User {username} removed from project: {project.title}")
+            self.save_project(project)
+            logger.bind(user=username, project=project.title).info(f"User {username} removed from project: {project.title}")
             console.print(f"[green]User {username} removed from the project![/green]")
         else:
-            logger.warning(f"Failed to remove user {username} from project: {project.title}. User not found.")
+            logger.bind(user=username, project=project.title).warning(f"Failed to remove user {username} from project: {project.title}. User not found.")
             console.print("[red]Error: User not found in the project.[/red]")
 
     def load_data(self):
-        try:
-            with open("data.json", 'r') as file:
-                users_data = json.load(file)
-                self.users = [User(**user) for user in users_data["users"]]
-                self.projects = [Project(**project) for project in users_data["projects"]]
-        except FileNotFoundError:
-            return []
-
-    def save_data(self):
-        def serialize_datetime(obj):
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            raise TypeError(f"Type {type(obj)} is not JSON serializable")
-
-        def serialize_project(project):
-            serialized_project = project.__dict__.copy()
-            serialized_project["tasks"] = [task.__dict__ for task in project.tasks]
-            return serialized_project
-
-        data = {
-            "users": [user.__dict__ for user in self.users],
-            "projects": [serialize_project(project) for project in self.projects]
-        }
-        with open("data.json", "w") as file:
-            json.dump(data, file, default=serialize_datetime)
+        users_data, projects_data = self.storage.load()
+        self.users = [User(**user) for user in users_data]
+        self.projects = [Project(**project) for project in projects_data]
+        self.snapshots.reset(self.users, self.projects)
+
+    @staticmethod
+    def serialize_project(project):
+        serialized_project = project.__dict__.copy()
+        serialized_project.pop("task_index", None)
+        serialized_project["tasks"] = [
+            {key: value for key, value in task.__dict__.items() if key != "frozen"} for task in project.tasks
+        ]
+        return serialized_project
+
+    def save_user(self, user):
+        self.storage.save_users([user.__dict__])
+
+    def save_project(self, project):
+        def belongs_to_project(event):
+            return event["project"] == project.title or project.get_task(event["task"]) is not None
+
+        if project not in self.projects:
+            # a removed project must not be written back as a new shard
+            bus.flush(belongs_to_project, deliver=False)
+            return
+        merged = self.storage.save_project(self.serialize_project(project))
+        if merged is not None:
+            project.refresh(merged)
+        self.snapshots.commit_project(project)
+        bus.flush(belongs_to_project)
+
+    def snapshot(self):
+        return self.snapshots.snapshot()
+
+    def bulk_edit_tasks(self, project, tasks, action, value=None, actor=None):
+        if action not in BULK_ACTIONS:
+            console.print(f"[red]Error: Unknown bulk action {action}.[/red]")
+            return 0
+        if action == "add_assignee" and not project.is_member_exist(value):
+            console.print("[bold red]Error: user not exist in this project!.[/]")
+            return 0
+
+        changed = 0
+        if action == "delete":
+            changed = project.remove_tasks(task.id for task in tasks)
+        for task in tasks:
+            # new tasks hold enums while loaded ones and the menu choices are plain values
+            if action == "status" and enum_value(task.status) != enum_value(value):
+                task.change_status(value, actor)
+            elif action == "archive" and enum_value(task.status) != TaskStatus.ARCHIVED.value:
+                task.change_status(TaskStatus.ARCHIVED.value, actor)
+            elif action == "priority" and enum_value(task.priority) != enum_value(value):
+                task.priority = value
+            elif action == "add_assignee" and value not in task.assignees:
+                task.add_member(value, actor)
+            elif action == "remove_assignee" and value in task.assignees:
+                task.assignees = tuple(assignee for assignee in task.assignees if assignee != value)
+            else:
+                continue
+            changed += 1
+
+        if changed:
+            self.save_project(project)
+        logger.bind(user=actor, project=project.title).info(
+            f"Bulk {action} applied to {changed} task(s) by user '{actor}'")
+        console.print(f"[green]{changed} task(s) updated successfully![/green]")
+        return changed
+
+    def whats_new(self, user):
+        events = self.inbox.unread(user.username)
+        self.inbox.mark_read(user.username, events)
+        return events
 
     def is_username_exists(self, username):
         for user in self.users:
@@ -294,6 +460,7 @@ class UserManager:
 
 
 def view_tasks(project):
+    from rich.table import Table
     table = Table(title=f"Tasks in Project: {project.title}")
     table.add_column("ID", style="cyan")
     table.add_column("Title", style="cyan")
@@ -314,7 +481,25 @@ def view_tasks(project):
     console.print(table)
 
 
+def parse_task_query(query):
+    import shlex
+    filters = {}
+    for token in shlex.split(query):
+        key, separator, value = token.partition("=")
+        if not separator or key not in ("id", "status", "priority", "assignee", "title"):
+            raise ValueError(f"Invalid filter: {token}")
+        if key == "id":
+            filters["ids"] = [task_id for task_id in value.split(",") if task_id]
+        elif key in ("status", "priority"):
+            filters[key] = value.upper()
+        else:
+            filters[key] = value
+    return filters
+
+
 def main():
+    from rich.prompt import Confirm, Prompt
+    from rich.table import Table
     user_manager = UserManager()
     current_user = None
 
@@ -345,6 +530,9 @@ def main():
                     if logged_user:
                         current_user = logged_user
                         console.print(f"[green]Logged in successfully as {current_user.username}![/green]")
+                        unread = len(user_manager.inbox.unread(current_user.username))
+                        if unread:
+                            console.print(f"[yellow]You have {unread} new notification(s), see What's new.[/yellow]")
                     else:
                         console.print("[red]Error: Invalid username or password.[/red]")
                 else:
@@ -356,8 +544,8 @@ def main():
         else:
 
             console.print(f"[bold]Welcome, {current_user.username}![/bold]")
-            choice = Prompt.ask("Select an option: (1) Create Project, (2) View Projects (3) Logout",
-                                choices=["1", "2", "3"])
+            choice = Prompt.ask("Select an option: (1) Create Project, (2) View Projects (3) Logout (4) What's new",
+                                choices=["1", "2", "3", "4"])
 
             if choice == "1":
                 project_id = input("Enter project ID: ")
@@ -389,6 +577,7 @@ def main():
 
                     elif action == "3":
                         user_manager.remove_project(project)
+                        break
 
                     elif action == "4":
                         break
@@ -422,11 +611,11 @@ def main():
                 
                 if selected_project:
                     while True:
-                        view_tasks(selected_project)
+                        view_tasks(user_manager.snapshot().projects[selected_project.key])
                         #project menu
                         action = Prompt.ask(
-                            "Select an action: (1) Create Task, (2) view Tasks (3) Back",
-                            choices=["1", "2", "3"])
+                            "Select an action: (1) Create Task, (2) view Tasks (3) Back (4) Bulk Edit Tasks",
+                            choices=["1", "2", "3", "4"])
 
                         if action == "1":
                             if current_user.username == selected_project.creator:
@@ -452,8 +641,8 @@ def main():
                                                          choices=["BACKLOG", "TODO", "DOING", "DONE", "ARCHIVED"], default="BACKLOG")
 
                                 selected_project.create_task(task_title, assignees, task_priority, task_status, task_description)
-                                logger.info(f"{task_title} by {current_user.username}")
-                                user_manager.save_data()
+                                logger.bind(user=current_user.username, project=selected_project.title).info(f"{task_title} by {current_user.username}")
+                                user_manager.save_project(selected_project)
 
                             else:
                                 print(current_user, selected_project.creator)
@@ -465,100 +654,147 @@ def main():
                                 task_id = Prompt.ask("Select a task ID to view details (or type 'exit' to go back):")
                                 if task_id == "exit":
                                     break
-                                for task in selected_project.tasks:
-                                    if task.id == task_id:
+                                task = selected_project.get_task(task_id)
+                                if task is None:
+                                    console.print("[red]Error: Task not found.[/red]")
+                                    continue
+                                if current_user.username != selected_project.creator:
+                                    if current_user.username not in task.assignees:
+                                        console.print(
+                                            "[bold red]Error:[/] You are not an assignee of this task. Access denied.")
+                                        continue
+
+                                console.print(task.generate_table())
+                                while True:
+                                    console.print("[bold]Select an attribute to modify:[/bold]")
+                                    console.print("1. Change Title")
+                                    console.print("2. Add Assignee")
+                                    console.print("3. Change Priority")
+                                    console.print("4. Change Status")
+                                    console.print("5. Add comment")
+                                    console.print("6. delete Comment")
+                                    console.print("7. Back to main menu")
+
+                                    choice = Prompt.ask("Enter your choice: ",
+                                                        choices=["1", "2", "3", "4", "5", "6", "7"])
+
+                                    if choice == "1":
+                                        new_title = Prompt.ask("Enter new title: ")
+                                        task.title = new_title
+                                        logger.bind(user=current_user.username, project=selected_project.title, task=task.id).info(f"Task title changed to '{new_title}' by user '{current_user.username}'")
+                                    elif choice == "2":
                                         if current_user.username != selected_project.creator:
-                                            if current_user.username not in task.assignees:
-                                                console.print(
-                                                    "[bold red]Error:[/] You are not an assignee of this task. Access denied.")
-                                                break
-
-                                        console.print(task.generate_table())
-                                        while True:
-                                            console.print("[bold]Select an attribute to modify:[/bold]")
-                                            console.print("1. Change Title")
-                                            console.print("2. Add Assignee")
-                                            console.print("3. Change Priority")
-                                            console.print("4. Change Status")
-                                            console.print("5. Add comment")
-                                            console.print("6. delete Comment")
-                                            console.print("7. Back to main menu")
-
-                                            choice = Prompt.ask("Enter your choice: ",
-                                                                choices=["1", "2", "3", "4", "5", "6", "7"])
-
-                                            if choice == "1":
-                                                new_title = Prompt.ask("Enter new title: ")
-                                                task.title = new_title
-                                                logger.info(f"Task title changed to '{new_title}' by user '{current_user.username}'")
-                                            elif choice == "2":
-                                                if current_user.username != selected_project.creator:
-                                                    console.print(
-                                                        "[bold red]Error:[/] Only the project creator can assign tasks to users. Access denied.")
-                                                    continue
-                                                new_username = Prompt.ask("Enter new username: ")
-                                                if user_manager.is_username_exists(new_username):
-                                                    if selected_project.is_member_exist(new_username):
-                                                      task.add_member(new_username)
-                                                      logger.info(f"User '{new_username}' added to task '{task.title}' by project creator '{current_user.username}'")
-                                                    else:
-                                                        console.print("[bold red]Error: user not exist in this project!.[/]")
-                                                else:
-                                                    console.print(
-                                                        "[bold red]Error:[/] user not found.")
-
-                                                pass
-                                            elif choice == "3":
-                                                new_task_priority = Prompt.ask(
-                                                    "Enter task priority (CRITICAL, HIGH, MEDIUM, LOW):",
-                                                    choices=["CRITICAL", "HIGH", "MEDIUM", "LOW"])
-                                                task.priority = new_task_priority
-                                                logger.info(f"Task priority changed to '{new_task_priority}' by user '{current_user.username}'")
-                                                pass
-                                            elif choice == "4":
-                                                new_task_status = Prompt.ask(
-                                                    "Enter task status (BACKLOG, TODO, DOING, DONE, ARCHIVED):",
-                                                    choices=["BACKLOG", "TODO", "DOING", "DONE", "ARCHIVED"])
-                                                task.status = new_task_status
-                                                logger.info(f"Task status changed to '{new_task_status}' by user '{current_user.username}'")
-
-                                                pass
-                                            elif choice == "5":
-                                                comments_table = task.generate_comments_table()
-                                                console.print(comments_table)
-                                                for task in selected_project.tasks:
-                                                    if task.id == task_id:
-                                                        comment_content = Prompt.ask("Enter comment:")
-                                                        task.add_comment(current_user, comment_content)
-                                                        user_manager.save_data()
-                                                        console.print("[green]Comment added successfully![/green]")
-                                                        user_manager.save_data()
-                                                        logger.info(f"Comment added to task '{task.title}' by user '{current_user.username}'")
-
-                                            elif choice == "6":
-                                                comments_table = task.generate_comments_table()
-                                                console.print(comments_table)
-                                                comment_id=Prompt.ask("select a comment to remove:")
-                                                if task.is_comment_exist(comment_id):
-                                                    if task.remove_comment(comment_id):
-                                                        print("Comment removed successfully.")
-                                                        logger.info(f"Comment removed from task '{task.title}' by user '{current_user.username}'")
-                                                else:
-                                                    print("Comment not found.")
-                                                pass
-                                            elif choice == "7":
-                                                user_manager.save_data()
-                                                break
-
-                                            console.print("Task attributes updated successfully!")
-                                    else:
-                                        console.print("")
+                                            console.print(
+                                                "[bold red]Error:[/] Only the project creator can assign tasks to users. Access denied.")
+                                            continue
+                                        new_username = Prompt.ask("Enter new username: ")
+                                        if user_manager.is_username_exists(new_username):
+                                            if selected_project.is_member_exist(new_username):
+                                              task.add_member(new_username, current_user.username)
+                                              logger.bind(user=current_user.username, project=selected_project.title, task=task.id).info(f"User '{new_username}' added to task '{task.title}' by project creator '{current_user.username}'")
+                                            else:
+                                                console.print("[bold red]Error: user not exist in this project!.[/]")
+                                        else:
+                                            console.print(
+                                                "[bold red]Error:[/] user not found.")
+
+                                        pass
+                                    elif choice == "3":
+                                        new_task_priority = Prompt.ask(
+                                            "Enter task priority (CRITICAL, HIGH, MEDIUM, LOW):",
+                                            choices=["CRITICAL", "HIGH", "MEDIUM", "LOW"])
+                                        task.priority = new_task_priority
+                                        logger.bind(user=current_user.username, project=selected_project.title, task=task.id).info(f"Task priority changed to '{new_task_priority}' by user '{current_user.username}'")
+                                        pass
+                                    elif choice == "4":
+                                        new_task_status = Prompt.ask(
+                                            "Enter task status (BACKLOG, TODO, DOING, DONE, ARCHIVED):",
+                                            choices=["BACKLOG", "TODO", "DOING", "DONE", "ARCHIVED"])
+                                        task.change_status(new_task_status, current_user.username)
+                                        logger.bind(user=current_user.username, project=selected_project.title, task=task.id).info(f"Task status changed to '{new_task_status}' by user '{current_user.username}'")
+
+                                        pass
+                                    elif choice == "5":
+                                        comments_table = task.generate_comments_table()
+                                        console.print(comments_table)
+                                        comment_content = Prompt.ask("Enter comment:")
+                                        task.add_comment(current_user, comment_content)
+                                        console.print("[green]Comment added successfully![/green]")
+                                        user_manager.save_project(selected_project)
+                                        logger.bind(user=current_user.username, project=selected_project.title, task=task.id).info(f"Comment added to task '{task.title}' by user '{current_user.username}'")
+
+                                    elif choice == "6":
+                                        comments_table = task.generate_comments_table()
+                                        console.print(comments_table)
+                                        comment_id=Prompt.ask("select a comment to remove:")
+                                        if task.is_comment_exist(comment_id):
+                                            if task.remove_comment(comment_id):
+                                                print("Comment removed successfully.")
+                                                logger.bind(user=current_user.username, project=selected_project.title, task=task.id).info(f"Comment removed from task '{task.title}' by user '{current_user.username}'")
+                                        else:
+                                            print("Comment not found.")
+                                        pass
+                                    elif choice == "7":
+                                        user_manager.save_project(selected_project)
+                                        break
+
+                                    console.print("Task attributes updated successfully!")
 
                         elif action == "3":
                             break
 
+                        elif action == "4":
+                            if current_user.username != selected_project.creator:
+                                console.print("[red]Error: You are not the project manager![/red]")
+                                continue
+                            query = Prompt.ask(
+                                "Select tasks (e.g. status=TODO priority=LOW assignee=sahar title=\"fix bug\" id=<id>,<id>):",
+                                default="")
+                            try:
+                                selected_tasks = selected_project.select_tasks(**parse_task_query(query))
+                            except ValueError as error:
+                                console.print(f"[red]Error: {error}[/red]")
+                                continue
+                            console.print(f"{len(selected_tasks)} task(s) selected.")
+                            if not selected_tasks:
+                                continue
+
+                            bulk_action = Prompt.ask(
+                                "Select a bulk action: (1) Move Status, (2) Change Priority, (3) Add Assignee, "
+                                "(4) Remove Assignee, (5) Archive, (6) Delete, (7) Cancel",
+                                choices=["1", "2", "3", "4", "5", "6", "7"])
+                            value = None
+                            if bulk_action == "1":
+                                value = Prompt.ask("Enter task status (BACKLOG, TODO, DOING, DONE, ARCHIVED):",
+                                                   choices=["BACKLOG", "TODO", "DOING", "DONE", "ARCHIVED"])
+                            elif bulk_action == "2":
+                                value = Prompt.ask("Enter task priority (CRITICAL, HIGH, MEDIUM, LOW):",
+                                                   choices=["CRITICAL", "HIGH", "MEDIUM", "LOW"])
+                            elif bulk_action in ("3", "4"):
+                                value = Prompt.ask("Enter username:")
+                            elif bulk_action == "7":
+                                continue
+                            operation = BULK_ACTIONS[int(bulk_action) - 1]
+                            if operation in ("archive", "delete"):
+                                # an empty query selects every task of the project
+                                scope = " (all tasks in the project)" if not query.strip() else ""
+                                if not Confirm.ask(f"{operation.capitalize()} {len(selected_tasks)} task(s){scope}?"):
+                                    continue
+                            user_manager.bulk_edit_tasks(selected_project, selected_tasks, operation, value,
+                                                         current_user.username)
+
             elif choice == "3":
                 current_user = None
+
+            elif choice == "4":
+                events = user_manager.whats_new(current_user)
+                news_table = Table(title="What's new")
+                news_table.add_column("Time", style="cyan")
+                news_table.add_column("Message", style="green")
+                for event in events:
+                    news_table.add_row(event["time"], event["message"])
+                console.print(news_table if events else "Nothing new.")
                 
 if __name__ == "__main__":
+    configure_logging()
     main()
\ No newline at end of file
@@ -1,10 +1,7 @@
 import os
+import shutil
 import argparse
-import json
-from rich.table import Table
-from rich.console import Console
-from rich.prompt import Prompt
-from rich.prompt import Confirm
+from storage import ShardedStorage
 
 class User:
     def __init__(self, username, email, password, activated=True):
@@ -20,29 +17,16 @@ class User:
         self.activated = False
 
 class UserManager:
-    def __init__(self, data_file):
-        self.data_file = data_file
+    def __init__(self, storage):
+        self.storage = storage
         self.users = self.load_data()
 
     def load_data(self):
-        try:
-            with open(self.data_file, 'r') as file:
-                users_data = json.load(file)
-                return [User(**user) for user in users_data["users"]]
-        except FileNotFoundError:
-            return []
+        return [User(**user) for user in self.storage.load_users()]
 
-    def save_data(self):
-        with open(self.data_file, 'r') as file:
-            all_data = json.load(file)
-
-        data = {
-            "users": [user.__dict__ for user in self.users],
-            "projects": all_data["projects"]
-        }
-
-        with open(self.data_file, 'w') as file:
-            json.dump(data, file)
+    def save_data(self, user):
+        # only this user's entry is replaced, other users and project shards are left untouched
+        self.storage.save_users([user.__dict__])
 
     def get_user_by_username(self, username):
         for user in self.users:
@@ -55,7 +39,7 @@ class UserManager:
         if user:
             user.activate()
             console.print(f"User '{username}' has been activated successfully.")
-            self.save_data()
+            self.save_data(user)
         else:
             console.print(f"User '{username}' not found.")
 
@@ -64,11 +48,12 @@ class UserManager:
         if user:
             user.deactivate()
             console.print(f"User '{username}' has been deactivated successfully.")
-            self.save_data()
+            self.save_data(user)
         else:
             console.print(f"User '{username}' not found.")
 
     def print_users_table(self):
+        from rich.table import Table
         table = Table(title="Users")
         table.add_column("Username")
         table.add_column("Email")
@@ -90,9 +75,14 @@ if __name__ == "__main__":
                 file.write(f"Username: {username}\nPassword: {password}")
             print("System administrator created successfully.")
     parser = argparse.ArgumentParser(description="Manage system administrators.")
-    parser.add_argument("action", choices=["create-admin","menu","purge-data"], help="Action to perform")
+    parser.add_argument("action", choices=["create-admin","menu","purge-data","query-log"], help="Action to perform")
     parser.add_argument("--username", help="Username for system administrator")
     parser.add_argument("--password", help="Password for system administrator")
+    parser.add_argument("--user", help="query-log: only records about this user")
+    parser.add_argument("--project", help="query-log: only records about this project title")
+    parser.add_argument("--task", help="query-log: only records about this task id")
+    parser.add_argument("--since", help="query-log: earliest time, ISO format (e.g. 2024-05-31T22:00)")
+    parser.add_argument("--until", help="query-log: latest time, ISO format")
 
     args = parser.parse_args()
 
@@ -102,35 +92,46 @@ if __name__ == "__main__":
         else:
             print("Error: Username and password are required for creating an administrator.")
     if args.action == "purge-data":
+        from rich.prompt import Confirm
         confirmed = Confirm.ask("Are you sure you want to purge all saved data?")
         if confirmed:
-            os.remove("data.json")
+            if os.path.exists("data.json"):
+                os.remove("data.json")
+            shutil.rmtree("data", ignore_errors=True)
             print("All saved data has been purged.")
         else:
             print("Operation canceled.")
-    console = Console()
-    data_file = "data.json"
-    user_manager = UserManager(data_file)
-
-    while True:
-        console.print("[bold green]Admin Menu[/bold green]")
-        console.print("1. Activate User")
-        console.print("2. Deactivate User")
-        console.print("3. Print All Users")
-        console.print("4. Exit")
-
-        choice = Prompt.ask("Enter your choice: ", choices=["1", "2", "3", "4"])
-
-        if choice == "1":
-            username = Prompt.ask("Enter the username to activate: ")
-            user_manager.activate_user(username)
-        elif choice == "2":
-            username = Prompt.ask("Enter the username to deactivate: ")
-            user_manager.deactivate_user(username)
-        elif choice == "3":
-            user_manager.print_users_table()
-        elif choice == "4":
-            break
-        else:
-            console.print("Invalid choice. Please choose again.")
- 
\ No newline at end of file
+    if args.action == "query-log":
+        from datetime import datetime
+        from log_archive import query_log
+        since = datetime.fromisoformat(args.since) if args.since else None
+        until = datetime.fromisoformat(args.until) if args.until else None
+        for record in query_log("app.log", args.user, args.project, args.task, since, until):
+            print(record)
+    if args.action == "menu":
+        from rich.console import Console
+        from rich.prompt import Prompt
+        console = Console()
+        user_manager = UserManager(ShardedStorage())
+
+        while True:
+            console.print("[bold green]Admin Menu[/bold green]")
+            console.print("1. Activate User")
+            console.print("2. Deactivate User")
+            console.print("3. Print All Users")
+            console.print("4. Exit")
+
+            choice = Prompt.ask("Enter your choice: ", choices=["1", "2", "3", "4"])
+
+            if choice == "1":
+                username = Prompt.ask("Enter the username to activate: ")
+                user_manager.activate_user(username)
+            elif choice == "2":
+                username = Prompt.ask("Enter the username to deactivate: ")
+                user_manager.deactivate_user(username)
+            elif choice == "3":
+                user_manager.print_users_table()
+            elif choice == "4":
+                break
+            else:
+                console.print("Invalid choice. Please choose again.")
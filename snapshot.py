@@ -0,0 +1,108 @@
+from collections import namedtuple
+from types import MappingProxyType
+
+UserSnapshot = namedtuple("UserSnapshot", ["email", "username", "activated"])
+
+TaskSnapshot = namedtuple("TaskSnapshot", [
+    "id", "title", "assignees", "priority", "status", "start_time", "end_date", "comments", "description"
+])
+
+Snapshot = namedtuple("Snapshot", ["version", "users", "projects"])
+
+
+class ProjectSnapshot(namedtuple("ProjectSnapshot", ["project_id", "title", "creator", "members", "tasks"])):
+    __slots__ = ()
+
+    def get_task(self, task_id):
+        for task in self.tasks:
+            if task.id == task_id:
+                return task
+        return None
+
+
+def freeze_user(user):
+    return UserSnapshot(user.email, user.username, user.activated)
+
+
+def freeze_task(task):
+    # tasks cache their frozen copy until they are modified, so unchanged tasks are shared between versions
+    frozen = getattr(task, "frozen", None)
+    if frozen is None:
+        frozen = TaskSnapshot(
+            task.id,
+            task.title,
+            task.assignees,
+            task.priority,
+            task.status,
+            task.start_time,
+            task.end_date,
+            task.comments,
+            task.description
+        )
+        task.frozen = frozen
+    return frozen
+
+
+def freeze_project(project):
+    return ProjectSnapshot(
+        project.project_id,
+        project.title,
+        project.creator,
+        tuple(project.members),
+        tuple(freeze_task(task) for task in project.tasks)
+    )
+
+
+class SnapshotStore:
+    """
+    Versioned, copy-on-write view of the committed ``UserManager`` state.
+
+    ``snapshot()`` is O(1): it hands out read-only proxies over the current
+    maps and marks them shared. The first commit after that copies the maps
+    (pointers only). Until the next commit, ``snapshot()`` hands out the same
+    snapshot again, so views taken in a loop share one copy. A commit refreezes only the tasks modified since their
+    last freeze, so untouched projects and tasks are shared between every
+    snapshot that contains them.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.users = {}
+        self.projects = {}
+        self.shared = False
+        self.last = None
+
+    def writable(self):
+        if self.shared:
+            self.users = dict(self.users)
+            self.projects = dict(self.projects)
+            self.shared = False
+
+    def reset(self, users, projects):
+        self.users = {user.username: freeze_user(user) for user in users}
+        self.projects = {project.key: freeze_project(project) for project in projects}
+        self.shared = False
+        self.version += 1
+
+    def commit_user(self, user):
+        self.writable()
+        self.users[user.username] = freeze_user(user)
+        self.version += 1
+
+    def commit_project(self, project):
+        self.writable()
+        self.projects[project.key] = freeze_project(project)
+        self.version += 1
+
+    def drop_project(self, key):
+        if key not in self.projects:
+            return
+        self.writable()
+        del self.projects[key]
+        self.version += 1
+
+    def snapshot(self):
+        if self.last is None or self.last.version != self.version:
+            self.shared = True
+            self.last = Snapshot(self.version, MappingProxyType(self.users), MappingProxyType(self.projects))
+        return self.last
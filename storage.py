@@ -0,0 +1,228 @@
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from types import MappingProxyType
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+def serialize_value(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, MappingProxyType):
+        return dict(obj)
+    raise TypeError(f"Type {type(obj)} is not JSON serializable")
+
+
+def read_json(path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def write_json(path, data):
+    # write to a temporary file first so readers never see a half written shard
+    temp_path = f"{path}.{os.urandom(16).hex()}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(data, file, default=serialize_value)
+    os.replace(temp_path, path)
+
+
+def item_key(item):
+    # comments are renumbered after a merge, so they are told apart by their content
+    if isinstance(item, dict):
+        return json.dumps({key: value for key, value in item.items() if key != "index"}, sort_keys=True)
+    return item
+
+
+def merge_list(base, mine, theirs):
+    base_keys = {item_key(item) for item in base}
+    removed = base_keys - {item_key(item) for item in mine}
+    merged = [item for item in theirs if item_key(item) not in removed]
+    merged_keys = {item_key(item) for item in merged}
+    merged += [item for item in mine if item_key(item) not in base_keys and item_key(item) not in merged_keys]
+    return merged
+
+
+def merge_tasks(base, mine, theirs):
+    base_tasks = {task["id"]: task for task in base}
+    my_tasks = {task["id"]: task for task in mine}
+    merged = []
+    for task in theirs:
+        if task["id"] in my_tasks:
+            base_task = base_tasks.get(task["id"])
+            task = merge_record(base_task, my_tasks[task["id"]], task) if base_task else my_tasks[task["id"]]
+        elif task["id"] in base_tasks:
+            continue
+        merged.append(task)
+    their_ids = {task["id"] for task in theirs}
+    merged += [task for task in mine if task["id"] not in their_ids and task["id"] not in base_tasks]
+    return merged
+
+
+def merge_record(base, mine, theirs):
+    """
+    Three-way merge of a project or task: fields changed since ``base`` in
+    ``mine`` are applied on top of ``theirs``. Lists keep additions and
+    removals from both sides and tasks are merged one by one, so two
+    sessions editing the same project only conflict on the same field.
+    """
+    merged = dict(theirs)
+    for field, value in mine.items():
+        if field == "tasks":
+            merged[field] = merge_tasks(base.get(field, []), value, theirs.get(field, []))
+        elif isinstance(value, list):
+            merged[field] = merge_list(base.get(field, []), value, theirs.get(field, []))
+        elif value != base.get(field):
+            merged[field] = value
+    if "comments" in merged:
+        merged["comments"] = [dict(comment, index=index) for index, comment in enumerate(merged["comments"], start=1)]
+    return merged
+
+
+@contextmanager
+def file_lock(path):
+    # exclusive lock shared by every process using the same lock file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a+") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ShardedStorage:
+    """
+    On-disk layout with one shard per project:
+
+        <data_dir>/users.json            registered users
+        <data_dir>/catalog.json          index of project keys
+        <data_dir>/projects/<key>.json   one project with its tasks and comments
+
+    Shards are named after the project's ``key``, so projects sharing a title
+    never overwrite each other. ``users.json`` and ``catalog.json`` are re-read
+    and patched under ``<data_dir>/.lock`` on every write rather than rewritten
+    from memory, so writers only replace the entries they changed. Shards are
+    written under ``projects/<key>.lock``: changes made since the shard was
+    loaded are merged into the current file (see ``merge_record``), so two
+    sessions editing one project keep each other's work. A single-file
+    ``data.json`` from older versions is migrated the first time neither file
+    exists.
+    """
+
+    def __init__(self, data_dir="data", legacy_file="data.json", max_workers=None):
+        self.data_dir = data_dir
+        self.projects_dir = os.path.join(data_dir, "projects")
+        self.users_file = os.path.join(data_dir, "users.json")
+        self.catalog_file = os.path.join(data_dir, "catalog.json")
+        self.lock_file = os.path.join(data_dir, ".lock")
+        self.legacy_file = legacy_file
+        self.max_workers = max_workers
+        self.shards = {}
+        self.bases = {}
+
+    def shard_path(self, key, suffix=".json"):
+        return os.path.join(self.projects_dir, f"{key}{suffix}")
+
+    def migrate_legacy(self):
+        if os.path.exists(self.users_file) or os.path.exists(self.catalog_file):
+            return
+        legacy = read_json(self.legacy_file) if self.legacy_file else None
+        if legacy is None:
+            return
+        with file_lock(self.lock_file):
+            if os.path.exists(self.users_file) or os.path.exists(self.catalog_file):
+                return
+            os.makedirs(self.projects_dir, exist_ok=True)
+            for project in legacy["projects"]:
+                project.setdefault("key", os.urandom(16).hex())
+                write_json(self.shard_path(project["key"]), project)
+            write_json(self.users_file, legacy["users"])
+            catalog = [{"key": project["key"], "title": project["title"]} for project in legacy["projects"]]
+            write_json(self.catalog_file, {"projects": catalog})
+
+    def load_users(self):
+        self.migrate_legacy()
+        return read_json(self.users_file) or []
+
+    def load(self):
+        from concurrent.futures import ThreadPoolExecutor
+        users = self.load_users()
+        catalog = read_json(self.catalog_file) or {"projects": []}
+        self.shards = {entry["key"]: entry["title"] for entry in catalog["projects"]}
+        paths = [self.shard_path(key) for key in self.shards]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            projects = [project for project in executor.map(read_json, paths) if project is not None]
+        self.bases = {project["key"]: project for project in projects}
+        return users, projects
+
+    def save_users(self, users):
+        with file_lock(self.lock_file):
+            stored = read_json(self.users_file) or []
+            positions = {user["username"]: index for index, user in enumerate(stored)}
+            for user in users:
+                if user["username"] in positions:
+                    stored[positions[user["username"]]] = user
+                else:
+                    positions[user["username"]] = len(stored)
+                    stored.append(user)
+            write_json(self.users_file, stored)
+
+    def update_catalog(self, added=(), removed=()):
+        with file_lock(self.lock_file):
+            catalog = read_json(self.catalog_file) or {"projects": []}
+            entries = {entry["key"]: entry["title"] for entry in catalog["projects"]}
+            for key in removed:
+                entries.pop(key, None)
+            for key, title in added:
+                entries[key] = title
+            projects = [{"key": key, "title": title} for key, title in entries.items()]
+            write_json(self.catalog_file, {"projects": projects})
+
+    def save_project(self, project_data):
+        """Write a project's shard and return the merged project if other sessions changed it, else None."""
+        # compare in JSON form, the way the shard and the loaded base are stored
+        project_data = json.loads(json.dumps(project_data, default=serialize_value))
+        key, title = project_data["key"], project_data["title"]
+        os.makedirs(self.projects_dir, exist_ok=True)
+        with file_lock(self.shard_path(key, ".lock")):
+            stored = read_json(self.shard_path(key))
+            base = self.bases.get(key)
+            merged = project_data
+            if base is not None and stored is not None and stored != base:
+                merged = merge_record(base, project_data, stored)
+            write_json(self.shard_path(key), merged)
+        self.bases[key] = merged
+        if self.shards.get(key) != title:
+            self.shards[key] = title
+            self.update_catalog(added=[(key, title)])
+        return merged if merged != project_data else None
+
+    def remove_project(self, key):
+        self.shards.pop(key, None)
+        self.bases.pop(key, None)
+        self.update_catalog(removed=[key])
+        with file_lock(self.shard_path(key, ".lock")):
+            try:
+                os.remove(self.shard_path(key))
+            except FileNotFoundError:
+                pass
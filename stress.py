@@ -0,0 +1,323 @@
+import argparse
+import contextlib
+import importlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import traceback
+from multiprocessing import get_context
+from storage import ShardedStorage, write_json
+
+DEFAULT_MIX = {"register": 1, "login": 1, "project": 2, "task": 4, "comment": 4, "admin": 1}
+
+
+def load_backend(spec):
+    module_name, _, class_name = spec.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class LastWriterWinsStorage(ShardedStorage):
+    """Writes shards straight from memory without merging, to check that the harness notices lost updates."""
+
+    def save_project(self, project_data):
+        os.makedirs(self.projects_dir, exist_ok=True)
+        key, title = project_data["key"], project_data["title"]
+        write_json(self.shard_path(key), project_data)
+        if self.shards.get(key) != title:
+            self.shards[key] = title
+            self.update_catalog(added=[(key, title)])
+        return None
+
+
+def seed_shared(data_dir, backend, users=2, projects=2):
+    """
+    Create the users, projects and tasks that every worker edits, so workers
+    contend on the same shards and user entries. Returns what they should
+    still contain, in the shape of a worker's expected state.
+    """
+    from passlib.hash import sha256_crypt
+    from main import Project, Task, User, UserManager
+    storage = backend(data_dir)
+    password = sha256_crypt.hash("password")
+    usernames = [f"shared-user{number}" for number in range(1, users + 1)]
+    expected = {"users": dict.fromkeys(usernames, True), "projects": set(), "tasks": set(), "comments": set()}
+    if not usernames:
+        return expected
+    storage.save_users([User(f"{username}@example.com", username, password).__dict__ for username in usernames])
+    for number in range(1, projects + 1):
+        project = Project(str(number), f"shared-project{number}", usernames[0], members=usernames)
+        project.tasks.append(Task(f"shared-task{number}", usernames))
+        storage.save_project(UserManager.serialize_project(project))
+        expected["projects"].add(project.title)
+        expected["tasks"].add((project.title, project.tasks[0].title))
+    return expected
+
+
+class Worker:
+    """
+    One simulated client. Every session loads the whole state like a fresh
+    ``main.py``/``manager.py`` process, runs ``session_ops`` operations and
+    records what it expects the final state to contain. Besides its own
+    users and projects it adds tasks and comments to the ``shared`` projects
+    and toggles the shared users, which every other worker edits too.
+    """
+
+    def __init__(self, index, data_dir, backend, ops, session_ops, mix, seed, shared=None):
+        self.index = index
+        self.data_dir = data_dir
+        self.backend = backend
+        self.ops = ops
+        self.session_ops = session_ops
+        self.mix = mix
+        self.random = random.Random(seed + index)
+        self.latencies = {}
+        self.errors = {}
+        self.expected = {"users": {}, "projects": set(), "tasks": set(), "comments": set()}
+        self.shared = shared or {"users": {}, "projects": set(), "tasks": set(), "comments": set()}
+        self.counter = 0
+        self.manager = None
+
+    def name(self, prefix):
+        self.counter += 1
+        return f"w{self.index}-{prefix}{self.counter}"
+
+    def timed(self, op, function):
+        start = time.perf_counter()
+        try:
+            function()
+        except Exception:
+            self.errors.setdefault(op, []).append(traceback.format_exc(limit=1).strip().splitlines()[-1])
+        finally:
+            self.latencies.setdefault(op, []).append(time.perf_counter() - start)
+
+    def open_session(self):
+        from main import UserManager
+        self.manager = UserManager(self.backend(self.data_dir))
+
+    def usernames(self):
+        return sorted(set(self.expected["users"]) | set(self.shared["users"]))
+
+    def some_user(self):
+        from main import User
+        username = self.random.choice(self.usernames())
+        found = next((user for user in self.manager.users if user.username == username), None)
+        return found or User(f"{username}@example.com", username, "")
+
+    def some_project(self, with_tasks=False):
+        if with_tasks:
+            titles = sorted({title for title, _ in self.expected["tasks"] | self.shared["tasks"]})
+        else:
+            titles = sorted(self.expected["projects"] | self.shared["projects"])
+        title = self.random.choice(titles)
+        project = next((project for project in self.manager.projects if project.title == title), None)
+        if project is None:
+            raise LookupError(f"project {title} missing from loaded state")
+        return project
+
+    def register(self):
+        username = self.name("user")
+        self.manager.register_user(f"{username}@example.com", username, "password")
+        self.expected["users"][username] = True
+
+    def login(self):
+        username = self.some_user().username
+        if self.manager.login(username, "password") is None:
+            raise LookupError(f"login failed for {username}")
+
+    def project(self):
+        title = self.name("project")
+        self.manager.create_project(str(self.counter), self.some_user(), title)
+        self.expected["projects"].add(title)
+
+    def task(self):
+        project = self.some_project()
+        title = self.name("task")
+        project.create_task(title, [project.creator])
+        self.manager.save_project(project)
+        self.expected["tasks"].add((project.title, title))
+
+    def comment(self):
+        project = self.some_project(with_tasks=True)
+        if not project.tasks:
+            raise LookupError(f"tasks of project {project.title} missing from loaded state")
+        task = self.random.choice(project.tasks)
+        content = self.name("comment")
+        task.add_comment(self.some_user(), content)
+        self.manager.save_project(project)
+        self.expected["comments"].add((project.title, task.title, content))
+
+    def admin(self):
+        import manager
+        admin = manager.UserManager(self.backend(self.data_dir))
+        username = self.some_user().username
+        user = admin.get_user_by_username(username)
+        if user is None:
+            raise LookupError(f"user {username} missing from loaded state")
+        user.activated = not user.activated
+        admin.save_data(user)
+        # the last value this worker wrote, see merge_expected
+        self.expected["users"][username] = user.activated
+
+    def choose(self):
+        if not self.usernames():
+            return "register"
+        projects = self.expected["projects"] | self.shared["projects"]
+        tasks = self.expected["tasks"] | self.shared["tasks"]
+        ops = [op for op in self.mix if (op != "task" or projects) and (op != "comment" or tasks)]
+        return self.random.choices(ops, weights=[self.mix[op] for op in ops])[0]
+
+    def result(self):
+        return {"latencies": self.latencies, "errors": self.errors, "expected": self.expected}
+
+    def run(self):
+        for number in range(self.ops):
+            if number % self.session_ops == 0:
+                self.timed("load", self.open_session)
+            op = self.choose()
+            self.timed(op, getattr(self, op))
+        return self.result()
+
+
+def run_worker(args):
+    from main import logger
+    logger.remove()
+    # relative paths used by the app (legacy data.json) resolve next to the data directory
+    os.chdir(os.path.dirname(args[1]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return Worker(*args).run()
+
+
+def diff_state(expected, users_data, projects_data):
+    users = {user["username"]: user for user in users_data}
+    projects = {project["title"]: project for project in projects_data}
+    tasks = {(project["title"], task["title"]): task for project in projects_data for task in project["tasks"]}
+    comments = {
+        (project["title"], task["title"], comment["content"])
+        for project in projects_data for task in project["tasks"] for comment in task["comments"]
+    }
+    return {
+        "lost users": sorted(name for name in expected["users"] if name not in users),
+        "wrong activation": sorted(
+            name for name, activated in expected["users"].items()
+            if name in users and users[name]["activated"] not in activated
+        ),
+        "lost projects": sorted(title for title in expected["projects"] if title not in projects),
+        "lost tasks": sorted(key for key in expected["tasks"] if key not in tasks),
+        "lost comments": sorted(key for key in expected["comments"] if key not in comments),
+    }
+
+
+def merge_expected(results, shared=None):
+    """
+    Combine the workers' expectations. Users toggled by several workers may
+    end up with any worker's last written value, since the final state is the
+    last write of one of them; seeded values only count if nobody wrote.
+    """
+    expected = {"users": {}, "projects": set(), "tasks": set(), "comments": set()}
+    for result in results:
+        for name, activated in result["expected"]["users"].items():
+            expected["users"].setdefault(name, set()).add(activated)
+        for key in ("projects", "tasks", "comments"):
+            expected[key] |= result["expected"][key]
+    if shared is not None:
+        for name, activated in shared["users"].items():
+            expected["users"].setdefault(name, {activated})
+        for key in ("projects", "tasks", "comments"):
+            expected[key] |= shared[key]
+    return expected
+
+
+def run(data_dir, workers=4, ops=50, session_ops=1, mix=None, seed=0, backend="storage:ShardedStorage",
+        shared_users=2, shared_projects=2):
+    backend_class = load_backend(backend)
+    data_dir = os.path.abspath(data_dir)
+    os.makedirs(os.path.dirname(data_dir), exist_ok=True)
+    shared = seed_shared(data_dir, backend_class, shared_users, shared_projects)
+    jobs = [
+        (index, data_dir, backend_class, ops, session_ops, mix or DEFAULT_MIX, seed, shared)
+        for index in range(workers)
+    ]
+    start = time.perf_counter()
+    with get_context("spawn").Pool(workers) as pool:
+        results = pool.map(run_worker, jobs)
+    elapsed = time.perf_counter() - start
+
+    latencies, errors = {}, {}
+    for result in results:
+        for op, values in result["latencies"].items():
+            latencies.setdefault(op, []).extend(values)
+        for op, messages in result["errors"].items():
+            errors.setdefault(op, []).extend(messages)
+
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(data_dir))
+    try:
+        users_data, projects_data = backend_class(data_dir).load()
+        corruption = None
+    except Exception as error:
+        users_data, projects_data = [], []
+        corruption = f"{type(error).__name__}: {error}"
+    finally:
+        os.chdir(cwd)
+
+    total = sum(len(values) for op, values in latencies.items() if op != "load")
+    return {
+        "elapsed": elapsed,
+        "operations": total,
+        "throughput": total / elapsed if elapsed else 0.0,
+        "latencies": latencies,
+        "errors": errors,
+        "corruption": corruption,
+        "diff": diff_state(merge_expected(results, shared), users_data, projects_data),
+    }
+
+
+def print_report(report):
+    print(f"{report['operations']} operations in {report['elapsed']:.2f}s "
+          f"({report['throughput']:.1f} ops/s)")
+    print(f"{'op':<10}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for op, values in sorted(report["latencies"].items()):
+        print(f"{op:<10}{len(values):>8}{len(report['errors'].get(op, [])):>8}"
+              f"{statistics.median(values) * 1000:>10.1f}{percentile(values, 0.95) * 1000:>10.1f}"
+              f"{percentile(values, 0.99) * 1000:>10.1f}{max(values) * 1000:>10.1f}")
+    for op, messages in sorted(report["errors"].items()):
+        for message in sorted(set(messages)):
+            print(f"error in {op}: {message} (x{messages.count(message)})")
+    print(f"corruption: {report['corruption'] or 'none'}")
+    for check, missing in report["diff"].items():
+        print(f"{check}: {len(missing)}" + (f"  e.g. {missing[:3]}" if missing else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run concurrent sessions against the storage layer.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--ops", type=int, default=50, help="Operations per worker")
+    parser.add_argument("--session-ops", type=int, default=1, help="Operations per session before reloading state")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--backend", default="storage:ShardedStorage", help="Storage class as module:Class")
+    parser.add_argument("--shared-users", type=int, default=2, help="Users every worker toggles")
+    parser.add_argument("--shared-projects", type=int, default=2, help="Projects every worker adds tasks and comments to")
+    parser.add_argument("--data-dir", help="Directory to run in (default: a temporary directory)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as scratch:
+        data_dir = args.data_dir or os.path.join(scratch, "data")
+        report = run(data_dir, args.workers, args.ops, args.session_ops, seed=args.seed, backend=args.backend,
+                     shared_users=args.shared_users, shared_projects=args.shared_projects)
+    print_report(report)
+    lost = any(report["diff"].values()) or report["corruption"]
+    sys.exit(1 if lost else 0)
+
+
+if __name__ == "__main__":
+    main()
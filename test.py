@@ -1,12 +1,16 @@
+import os
+import gzip
+import json
 import pytest
 from datetime import datetime
 from passlib.hash import sha256_crypt
 from unittest.mock import MagicMock
-from main import UserManager, User, Project, Task, TaskStatus, TaskPriority
+from main import UserManager, User, Project, Task, TaskStatus, TaskPriority, parse_task_query
+from storage import ShardedStorage, write_json
 
 @pytest.fixture
-def user_manager():
-    return UserManager()
+def user_manager(storage):
+    return UserManager(storage)
 
 @pytest.fixture
 def user():
@@ -106,4 +110,397 @@ def test_is_email_duplicate(user_manager, user):
 def test_is_username_duplicate(user_manager, user):
     user_manager.users.append(user)
     assert user_manager.is_username_duplicate("testuser")
-    assert not user_manager.is_username_duplicate("notindb")
\ No newline at end of file
+    assert not user_manager.is_username_duplicate("notindb")
+
+@pytest.fixture
+def storage(tmp_path):
+    return ShardedStorage(str(tmp_path / "data"), legacy_file=str(tmp_path / "data.json"))
+
+def test_sharded_storage_round_trip(storage, user):
+    manager = UserManager(storage)
+    manager.users.append(user)
+    manager.save_user(user)
+    project = manager.create_project("1", user, "Test Project")
+    project.create_task("Test Task", ["testuser"], "HIGH", "TODO", "Task description")
+    project.tasks[0].add_comment(user, "Test comment")
+    manager.save_project(project)
+
+    reloaded = UserManager(ShardedStorage(storage.data_dir, legacy_file=None))
+    assert [u.username for u in reloaded.users] == ["testuser"]
+    task = reloaded.projects[0].tasks[0]
+    assert task.id == project.tasks[0].id
+    assert task.comments[0]["content"] == "Test comment"
+    assert isinstance(task.comments[0]["time"], datetime)
+
+def test_save_project_rewrites_only_its_shard(storage, user):
+    manager = UserManager(storage)
+    first = manager.create_project("1", user, "First")
+    second = manager.create_project("2", user, "Second")
+    first_shard = storage.shard_path(first.key)
+    with open(first_shard) as file:
+        before = file.read()
+
+    second.create_task("Test Task", ["testuser"])
+    manager.save_project(second)
+
+    with open(first_shard) as file:
+        assert file.read() == before
+    manager.remove_project(first)
+    assert not os.path.exists(first_shard)
+    assert [p.title for p in UserManager(storage).projects] == ["Second"]
+
+def test_removed_project_is_not_saved_again(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    manager.remove_project(project)
+    manager.add_member_to_project(project, "carol")
+    assert UserManager(storage).projects == []
+
+def test_sessions_on_one_project_keep_each_others_changes(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    project.create_task("t0", [user.username])
+    manager.save_project(project)
+    # separate processes, each with its own storage
+    first = UserManager(ShardedStorage(storage.data_dir, storage.legacy_file))
+    second = UserManager(ShardedStorage(storage.data_dir, storage.legacy_file))
+
+    first.projects[0].create_task("new-by-A", [user.username])
+    first.save_project(first.projects[0])
+    second.projects[0].tasks[0].add_comment(user, "comment-by-B")
+    second.save_project(second.projects[0])
+
+    assert [task.title for task in second.projects[0].tasks] == ["t0", "new-by-A"]
+    reloaded = UserManager(storage).projects[0]
+    assert [task.title for task in reloaded.tasks] == ["t0", "new-by-A"]
+    assert [comment["content"] for comment in reloaded.tasks[0].comments] == ["comment-by-B"]
+
+def test_stale_sessions_keep_each_others_users(storage, user):
+    import manager as admin_module
+    session = UserManager(storage)
+    admin = admin_module.UserManager(storage)
+    session.users.append(user)
+    session.save_user(user)
+
+    other = User("other@example.com", "other", "password")
+    UserManager(storage).save_user(other)
+    admin_user = admin_module.User("other", "other@example.com", "password")
+    admin_user.deactivate()
+    admin.save_data(admin_user)
+    session.create_project("1", user, "Test Project")
+
+    users = {u.username: u.activated for u in UserManager(storage).users}
+    assert users == {"testuser": True, "other": False}
+
+def test_legacy_data_file_is_migrated(storage):
+    write_json(storage.legacy_file, {
+        "users": [{"email": "test@example.com", "username": "testuser", "password": "x", "activated": True}],
+        "projects": [{"project_id": "1", "title": "Old", "creator": "testuser", "members": ["testuser"], "tasks": []}]
+    })
+    manager = UserManager(storage)
+    assert [p.title for p in manager.projects] == ["Old"]
+    assert os.path.exists(storage.catalog_file)
+    assert manager.projects[0].key in storage.shards
+
+def test_legacy_projects_with_duplicate_titles_are_kept(storage):
+    write_json(storage.legacy_file, {
+        "users": [],
+        "projects": [
+            {"project_id": "1", "title": "Same", "creator": "a", "members": ["a"], "tasks": []},
+            {"project_id": "2", "title": "Same", "creator": "b", "members": ["b"], "tasks": []}
+        ]
+    })
+    UserManager(storage)
+    reloaded = UserManager(ShardedStorage(storage.data_dir, legacy_file=None))
+    assert sorted(p.creator for p in reloaded.projects) == ["a", "b"]
+    assert len({p.key for p in reloaded.projects}) == 2
+
+def test_create_project_refuses_duplicate_title(storage, user):
+    manager = UserManager(storage)
+    manager.create_project("1", user, "Test Project")
+    assert manager.create_project("2", user, "Test Project") is None
+    assert len(UserManager(storage).projects) == 1
+
+def test_snapshot_is_isolated_from_later_writes(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    project.create_task("Test Task", ["testuser"])
+    manager.save_project(project)
+    before = manager.snapshot()
+
+    project.tasks[0].title = "Renamed"
+    project.create_task("Second Task", ["testuser"])
+    manager.save_project(project)
+    after = manager.snapshot()
+
+    assert after.version > before.version
+    assert [t.title for t in before.projects[project.key].tasks] == ["Test Task"]
+    assert [t.title for t in after.projects[project.key].tasks] == ["Renamed", "Second Task"]
+
+def test_snapshot_shares_unchanged_tasks(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    project.create_task("First Task", ["testuser"])
+    project.create_task("Second Task", ["testuser"])
+    manager.save_project(project)
+    before = manager.snapshot()
+
+    project.tasks[1].add_comment(user, "Test comment")
+    manager.save_project(project)
+    after = manager.snapshot()
+
+    assert before.projects[project.key].tasks[0] is after.projects[project.key].tasks[0]
+    assert before.projects[project.key].tasks[1] is not after.projects[project.key].tasks[1]
+    assert len(after.projects[project.key].tasks[1].comments) == 1
+
+def test_task_fields_change_only_by_reassignment(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    project.create_task("Test Task", ["testuser"])
+    task = project.tasks[0]
+    task.add_comment(user, "Test comment")
+    manager.save_project(project)
+    before = manager.snapshot()
+
+    with pytest.raises(AttributeError):
+        task.assignees.append("sahar")
+    with pytest.raises(TypeError):
+        task.comments[0]["content"] = "Edited"
+    manager.bulk_edit_tasks(project, [task], "remove_assignee", "testuser")
+    after = manager.snapshot()
+
+    assert before.projects[project.key].tasks[0].assignees == ("testuser",)
+    assert after.projects[project.key].tasks[0].assignees == ()
+
+def test_snapshot_is_reused_until_the_next_commit(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    first = manager.snapshot()
+    assert manager.snapshot() is first
+
+    projects = manager.snapshots.projects
+    manager.save_project(project)
+    assert manager.snapshots.projects is not projects
+    second = manager.snapshot()
+    assert second is not first and second.version > first.version
+    assert manager.snapshot() is second
+
+def test_snapshot_shares_unchanged_projects(storage, user):
+    manager = UserManager(storage)
+    first = manager.create_project("1", user, "First")
+    second = manager.create_project("2", user, "Second")
+    third = manager.create_project("3", user, "Third")
+    before = manager.snapshot()
+
+    second.create_task("Test Task", ["testuser"])
+    manager.save_project(second)
+    manager.remove_project(first)
+    after = manager.snapshot()
+
+    assert first.key in before.projects and first.key not in after.projects
+    assert before.projects[second.key] is not after.projects[second.key]
+    assert before.projects[third.key] is after.projects[third.key]
+    with pytest.raises(TypeError):
+        after.projects["Other"] = None
+
+def test_archived_log_query(tmp_path):
+    from loguru import logger
+    from log_archive import LOG_FORMAT, add_entities, archive_log, query_log
+    log_file = tmp_path / "app.log"
+    rotated = tmp_path / "app.2024-05-31_22-00-00_000000.log"
+    sink = logger.add(str(rotated), format=LOG_FORMAT, level="INFO")
+    patched = logger.patch(add_entities)
+    for i in range(6):
+        patched.bind(user="sahar", project="p5").info(f"sahar event {i}")
+    for i in range(6):
+        patched.bind(user="saman", project="p1", task="t1").info(f"saman event {i}")
+    logger.remove(sink)
+
+    archive_log(str(rotated), block_records=4)
+    assert not rotated.exists()
+    with gzip.open(f"{rotated}.gz", "rt") as file:
+        assert len(file.read().splitlines()) == 12
+    with open(f"{rotated}.gz.idx") as file:
+        blocks = json.load(file)["blocks"]
+    assert len(blocks) == 3
+    assert [block["user"] for block in blocks] == [["sahar"], ["sahar", "saman"], ["saman"]]
+
+    log_file.write_text("2024-06-01 10:00:00.000 | INFO     | main:login:1 - live"
+                        ' | entities={"user": "saman"}\n')
+    records = list(query_log(str(log_file), user="saman", project="p1"))
+    assert [record.split(" - ")[1].split(" | ")[0] for record in records] == [f"saman event {i}" for i in range(6)]
+    assert len(list(query_log(str(log_file), user="saman"))) == 7
+    assert list(query_log(str(log_file), user="saman", project="p5")) == []
+    assert list(query_log(str(log_file), until=datetime(2024, 1, 1))) == []
+
+def test_whats_new_receives_project_and_task_events(storage, user):
+    manager = UserManager(storage)
+    sahar = User("sahar@example.com", "sahar", "password")
+    project = manager.create_project("1", user, "Test Project")
+    manager.add_member_to_project(project, "sahar")
+    project.create_task("Test Task", ["sahar"])
+    task = project.tasks[0]
+    task.add_comment(user, "Test comment")
+    task.change_status("DOING", actor="testuser")
+    task.add_comment(sahar, "Own comment")
+    assert [event["kind"] for event in manager.inbox.unread("sahar")] == ["project_member_added"]
+    manager.save_project(project)
+
+    events = manager.whats_new(sahar)
+    assert [event["kind"] for event in events] == ["project_member_added", "task_assigned", "task_comment", "task_status"]
+    assert manager.whats_new(sahar) == []
+    assert manager.whats_new(user) == []
+
+    task.add_member("testuser", actor="sahar")
+    manager.save_project(project)
+    assert [event["kind"] for event in manager.whats_new(user)] == ["task_assigned"]
+
+def test_unsaved_changes_are_not_notified(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    project.create_task("Test Task", ["testuser"])
+    manager.save_project(project)
+    project.tasks[0].add_member("sahar", actor="testuser")
+
+    UserManager(storage)
+    assert manager.inbox.unread("sahar") == []
+
+def test_inbox_is_bounded(tmp_path):
+    from events import EventBus, Inbox
+    inbox = Inbox(str(tmp_path), size=5)
+    local_bus = EventBus()
+    local_bus.subscribe("inbox", inbox.deliver)
+    for i in range(23):
+        local_bus.publish("task_comment", ["sahar"], f"message {i}")
+        local_bus.flush()
+
+    with open(inbox.path("sahar")) as file:
+        assert len(file.readlines()) < 10
+    events = inbox.unread("sahar")
+    assert [event["message"] for event in events] == [f"message {i}" for i in range(18, 23)]
+    inbox.mark_read("sahar", events)
+    local_bus.publish("task_comment", ["sahar"], "message 23")
+    local_bus.flush()
+    assert [event["message"] for event in inbox.unread("sahar")] == ["message 23"]
+
+def test_inbox_is_bounded_across_processes(tmp_path):
+    from events import Inbox
+    # one Inbox per process, delivering to the same file
+    inboxes = [Inbox(str(tmp_path), size=3), Inbox(str(tmp_path), size=3)]
+    for i in range(20):
+        inboxes[i % 2].deliver({"seq": i + 1, "message": f"message {i}", "recipients": ["sahar"]})
+
+    assert len(inboxes[0].read_lines("sahar")) < 6
+    assert [event["message"] for event in inboxes[1].events("sahar")] == [f"message {i}" for i in range(17, 20)]
+
+def test_deleted_tasks_leave_no_pending_events(user_manager, user):
+    from events import bus
+    project = user_manager.create_project("1", user, "Test Project")
+    project.create_task("Task 1", [])
+    user_manager.save_project(project)
+    project.tasks[0].add_member("sahar", user.username)
+    project.remove_task(project.tasks[0].id)
+    user_manager.save_project(project)
+    assert bus.pending == []
+
+def test_parse_task_query():
+    assert parse_task_query('status=todo assignee=sahar title="fix bug" id=a,b') == {
+        "status": "TODO", "assignee": "sahar", "title": "fix bug", "ids": ["a", "b"]
+    }
+    with pytest.raises(ValueError):
+        parse_task_query("owner=sahar")
+
+def test_bulk_edit_tasks(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    project.add_member("sahar")
+    for i in range(6):
+        project.create_task(f"Task {i}", ["testuser"], "LOW", "TODO" if i % 2 else "BACKLOG")
+    todo = project.select_tasks(status="TODO")
+    assert [task.title for task in todo] == ["Task 1", "Task 3", "Task 5"]
+
+    assert manager.bulk_edit_tasks(project, todo, "add_assignee", "sahar", "testuser") == 3
+    assert manager.bulk_edit_tasks(project, project.select_tasks(assignee="sahar"), "priority", "HIGH") == 3
+    assert manager.bulk_edit_tasks(project, todo, "add_assignee", "stranger") == 0
+    backlog = project.select_tasks(status="BACKLOG")
+    manager.bulk_edit_tasks(project, backlog, "delete")
+
+    assert project.get_task(backlog[0].id) is None
+    reloaded = UserManager(storage).projects[0]
+    assert sorted(task.title for task in reloaded.tasks) == ["Task 1", "Task 3", "Task 5"]
+    assert all(task.priority == "HIGH" and "sahar" in task.assignees for task in reloaded.tasks)
+    assert reloaded.get_task(todo[0].id).title == "Task 1"
+
+def test_bulk_edit_skips_tasks_already_in_that_state(storage, user):
+    from events import bus
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    project.create_task("Task 1", ["sahar"])
+    manager.save_project(project)
+    manager.storage = MagicMock(wraps=manager.storage)
+
+    assert manager.bulk_edit_tasks(project, project.tasks, "status", "BACKLOG", "testuser") == 0
+    assert manager.bulk_edit_tasks(project, project.tasks, "priority", "LOW", "testuser") == 0
+    manager.storage.save_project.assert_not_called()
+    assert bus.pending == []
+
+def test_bulk_remove_assignee_after_leaving_project(storage, user):
+    manager = UserManager(storage)
+    project = manager.create_project("1", user, "Test Project")
+    manager.add_member_to_project(project, "bob")
+    project.create_task("Task 1", ["bob"])
+    project.create_task("Task 2", ["testuser"])
+    manager.remove_member_from_project(project, "bob")
+
+    assert manager.bulk_edit_tasks(project, project.tasks, "remove_assignee", "bob") == 1
+    assert [task.assignees for task in project.tasks] == [(), ("testuser",)]
+    assert manager.bulk_edit_tasks(project, project.tasks, "remove_assignee", "bob") == 0
+
+def test_stress_diff_reports_lost_updates():
+    from stress import diff_state
+    expected = {
+        "users": {"a": {True}, "b": {False}, "c": {True, False}},
+        "projects": {"p1", "p2"},
+        "tasks": {("p1", "t1")},
+        "comments": {("p1", "t1", "c1")},
+    }
+    users = [{"username": "a", "activated": False}, {"username": "c", "activated": False}]
+    projects = [{"title": "p1", "tasks": [{"title": "t1", "comments": []}]}]
+    assert diff_state(expected, users, projects) == {
+        "lost users": ["b"],
+        "wrong activation": ["a"],
+        "lost projects": ["p2"],
+        "lost tasks": [],
+        "lost comments": [("p1", "t1", "c1")],
+    }
+
+@pytest.mark.parametrize("backend, lost", [
+    ("stress:LastWriterWinsStorage", [("shared-project1", "w0-task1")]),
+    ("storage:ShardedStorage", []),
+])
+def test_stress_catches_lost_update_on_shared_project(tmp_path, monkeypatch, backend, lost):
+    from stress import Worker, diff_state, load_backend, merge_expected, seed_shared
+    monkeypatch.chdir(tmp_path)
+    data_dir = str(tmp_path / "data")
+    backend = load_backend(backend)
+    shared = seed_shared(data_dir, backend, users=1, projects=1)
+    first, second = (Worker(index, data_dir, backend, 1, 1, {}, 0, shared) for index in range(2))
+    # the second session loads before the first one saves its task
+    first.open_session()
+    second.open_session()
+    first.task()
+    second.comment()
+
+    users, projects = backend(data_dir).load()
+    diff = diff_state(merge_expected([first.result(), second.result()], shared), users, projects)
+    assert diff["lost tasks"] == lost
+    assert diff["lost comments"] == []
+
+def test_stress_single_worker_loses_nothing(tmp_path):
+    from stress import run
+    report = run(str(tmp_path / "data"), workers=1, ops=8,
+                 mix={"project": 1, "task": 2, "comment": 2, "admin": 1}, seed=1)
+    assert report["operations"] == 8
+    assert report["corruption"] is None
+    assert report["errors"] == {}
+    assert not any(report["diff"].values())